@@ -1,11 +1,38 @@
 import os
+import shutil
 import subprocess
-import re
+import hashlib
 import json
 import argparse
+import threading
+import concurrent.futures
 from typing import List, Dict, Any
 
+try:
+    import re2 as _re
+except ImportError:
+    import re as _re
+
+_IDENT_CHARS = frozenset(b'ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz_0123456789')
+_SPACE_CHARS = frozenset(b' \t\r\n\f\v')
+_TOKEN_RE = _re.compile(rb'[/"\'{}(]')
+# Braces opened by these only group declarations, so functions inside them still count as top level.
+_SCOPE_RE = _re.compile(
+    rb'(?:\bnamespace(?:\s+[A-Za-z_][\w:]*)?'
+    rb'|\bextern\s*"[^"]*"'
+    rb'|\b(?:class|struct|union)(?:\s+[A-Za-z_]\w*)?(?:\s+final)?(?:\s*:[^;{}()]*)?)\s*$'
+)
+_SCOPE_LOOKBEHIND = 256
+_CACHE_DIR = '.test_cache'
+# Generated tests include functions.h through this path, relative to the test file.
+_HEADER_FILE = "../src/functions.h"
+_CXX = "g++"
+_CXX_FLAGS = ["-O0", "-pipe", "-std=c++11"]
+_HEADER_SUFFIXES = ('.h', '.hh', '.hpp', '.hxx')
+
 class CppFunction:
+    __slots__ = ('name', 'return_type', 'parameters')
+
     def __init__(self, name: str, return_type: str, parameters: List[str]):
         self.name = name
         self.return_type = return_type
@@ -17,83 +44,256 @@ class CppFunction:
 class CppParser:
     @staticmethod
     def parse_file(file_path: str) -> List[CppFunction]:
-        with open(file_path, 'r') as file:
+        with open(file_path, 'rb') as file:
             content = file.read()
 
-        function_pattern = r'(\w+)\s+(\w+)\s*\(([\w\s,]*)\)\s*{'
-        matches = re.finditer(function_pattern, content)
-
         functions = []
-        for match in matches:
-            return_type, name, params = match.groups()
-            parameters = [param.strip() for param in params.split(',') if param.strip()]
-            functions.append(CppFunction(name, return_type, parameters))
+        scopes = []
+        depth = 0
+        i = 0
+        while True:
+            token = _TOKEN_RE.search(content, i)
+            if token is None:
+                break
+            i = token.start()
+            char = content[i]
+            if char == 0x2F and content.startswith(b'//', i):
+                i = content.find(b'\n', i)
+                if i < 0:
+                    break
+            elif char == 0x2F and content.startswith(b'/*', i):
+                i = content.find(b'*/', i + 2)
+                if i < 0:
+                    break
+                i += 2
+                continue
+            elif char == 0x22 or char == 0x27:
+                i = CppParser._skip_literal(content, i)
+                continue
+            elif char == 0x7B:
+                # Search a slice: re2 will not match an end anchor against endpos.
+                transparent = _SCOPE_RE.search(content[max(i - _SCOPE_LOOKBEHIND, 0):i]) is not None
+                scopes.append(transparent)
+                if not transparent:
+                    depth += 1
+            elif char == 0x7D:
+                if scopes and not scopes.pop():
+                    depth -= 1
+            elif char == 0x28 and depth == 0:
+                function = CppParser._match_function(content, i)
+                if function is not None:
+                    function, i = function
+                    functions.append(function)
+                    continue
+            i += 1
 
         return functions
 
+    @staticmethod
+    def _skip_literal(content: bytes, start: int) -> int:
+        quote = content[start]
+        i = start + 1
+        length = len(content)
+        while i < length:
+            char = content[i]
+            if char == 0x5C:
+                i += 2
+                continue
+            if char == quote or char == 0x0A:
+                return i + 1
+            i += 1
+        return length
+
+    @staticmethod
+    def _match_function(content: bytes, paren: int):
+        close = content.find(b')', paren)
+        if close < 0:
+            return None
+        body = close + 1
+        length = len(content)
+        while body < length and content[body] in _SPACE_CHARS:
+            body += 1
+        if body >= length or content[body] != 0x7B:
+            return None
+
+        name_end = paren
+        while name_end > 0 and content[name_end - 1] in _SPACE_CHARS:
+            name_end -= 1
+        name_start = name_end
+        while name_start > 0 and content[name_start - 1] in _IDENT_CHARS:
+            name_start -= 1
+        type_end = name_start
+        while type_end > 0 and content[type_end - 1] in _SPACE_CHARS:
+            type_end -= 1
+        type_start = type_end
+        while type_start > 0 and content[type_start - 1] in _IDENT_CHARS:
+            type_start -= 1
+
+        name = content[name_start:name_end]
+        return_type = content[type_start:type_end]
+        if (not name or not return_type or type_end == name_start
+                or name[0] in b'0123456789' or return_type[0] in b'0123456789'):
+            return None
+
+        params = content[paren + 1:close].decode()
+        parameters = [param.strip() for param in params.split(',') if param.strip()]
+        return CppFunction(name.decode(), return_type.decode(), parameters), body
+
+_TEST_STUB = (
+    "void test_{name}() {{\n"
+    "    // TODO: Implement test for {name}\n"
+    "    // Example: assert({name}(...) == expected_result);\n"
+    "}}\n\n"
+)
+
 class TestGenerator:
     @staticmethod
     def generate_test_file(functions: List[CppFunction], output_file: str):
+        # functions.h comes first so g++ can use its precompiled header.
+        parts = [
+            f"#include \"{_HEADER_FILE}\"\n",
+            "#include <iostream>\n",
+            "#include <cassert>\n\n",
+        ]
+        parts.extend(_TEST_STUB.format_map({"name": func.name}) for func in functions)
+
+        parts.append("int main() {\n")
+        parts.extend(f"    test_{func.name}();\n" for func in functions)
+        parts.append("    std::cout << \"All tests passed!\" << std::endl;\n")
+        parts.append("    return 0;\n")
+        parts.append("}\n")
+
         with open(output_file, 'w') as file:
-            file.write("#include <iostream>\n")
-            file.write("#include <cassert>\n")
-            file.write("#include \"../src/functions.h\"\n\n")
-
-            for func in functions:
-                file.write(f"void test_{func.name}() {{\n")
-                file.write(f"    // TODO: Implement test for {func.name}\n")
-                file.write(f"    // Example: assert({func.name}(...) == expected_result);\n")
-                file.write("}\n\n")
-
-            file.write("int main() {\n")
-            for func in functions:
-                file.write(f"    test_{func.name}();\n")
-            file.write("    std::cout << \"All tests passed!\" << std::endl;\n")
-            file.write("    return 0;\n")
-            file.write("}\n")
+            file.write(''.join(parts))
 
 class TestRunner:
     @staticmethod
-    def compile_and_run(test_file: str) -> Dict[str, Any]:
-        compile_command = f"g++ -std=c++11 -I../src {test_file} -o test_executable"
-        run_command = "./test_executable"
+    def _temp_path(path: str) -> str:
+        return f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+    @staticmethod
+    def _header_hash(header_dir: str) -> str:
+        digest = hashlib.blake2b()
+        digest.update(" ".join([_CXX, *_CXX_FLAGS]).encode())
+        if os.path.isdir(header_dir):
+            for name in sorted(f for f in os.listdir(header_dir) if f.endswith(_HEADER_SUFFIXES)):
+                with open(os.path.join(header_dir, name), 'rb') as file:
+                    digest.update(file.read())
+        return digest.hexdigest()
 
+    @staticmethod
+    def _source_hash(test_file: str) -> str:
+        header_dir = os.path.dirname(os.path.join(os.path.dirname(test_file), _HEADER_FILE))
+        with open(test_file, 'rb') as file:
+            digest = hashlib.blake2b(file.read())
+        digest.update(TestRunner._header_hash(header_dir).encode())
+        return digest.hexdigest()
+
+    @staticmethod
+    def precompile_header(header_file: str) -> None:
+        if not os.path.exists(header_file):
+            return
+        pch_file = f"{header_file}.gch"
+        stamp_file = f"{pch_file}.stamp"
+        # g++ does not check headers included by the PCH, so key it on all of them.
+        key = TestRunner._header_hash(os.path.dirname(header_file))
+        if os.path.exists(pch_file) and os.path.exists(stamp_file):
+            with open(stamp_file, 'r') as file:
+                if file.read() == key:
+                    return
+        for path in (pch_file, stamp_file):
+            if os.path.exists(path):
+                os.remove(path)
+
+        # Best effort: if this fails g++ simply parses the header as usual.
         try:
-            subprocess.run(compile_command, shell=True, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        except subprocess.CalledProcessError as e:
-            return {"success": False, "stage": "compilation", "error": e.stderr.decode()}
+            result = subprocess.run([_CXX, *_CXX_FLAGS, "-x", "c++-header", header_file, "-o", pch_file],
+                                    stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        except OSError:
+            return
+        if result.returncode == 0:
+            with open(stamp_file, 'w') as file:
+                file.write(key)
+
+    @staticmethod
+    def compile_and_run(test_file: str) -> Dict[str, Any]:
+        key = TestRunner._source_hash(test_file)
+        executable = os.path.join(_CACHE_DIR, f"{key}.exe")
+        output_file = os.path.join(_CACHE_DIR, f"{key}.stdout")
+
+        if os.path.exists(output_file):
+            with open(output_file, 'r') as file:
+                return {"success": True, "output": file.read()}
+
+        os.makedirs(_CACHE_DIR, exist_ok=True)
+        temp_executable = TestRunner._temp_path(executable)
+        # Generated tests are tiny, so compile time dominates: skip optimisation and temp files.
+        compile_command = [_CXX, *_CXX_FLAGS, "-I../src", test_file, "-o", temp_executable]
+        compile_env = None
+        if shutil.which("ccache"):
+            compile_command.insert(0, "ccache")
+            compile_env = dict(os.environ, CCACHE_DIR=os.path.abspath(os.path.join(_CACHE_DIR, "ccache")))
+        run_command = [os.path.abspath(executable)]
+
+        if not os.path.exists(executable):
+            try:
+                subprocess.run(compile_command, env=compile_env, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+            except subprocess.CalledProcessError as e:
+                return {"success": False, "stage": "compilation", "error": e.stderr.decode('utf-8', errors='replace')}
+            except OSError as e:
+                return {"success": False, "stage": "compilation", "error": str(e)}
+            os.replace(temp_executable, executable)
 
         try:
-            result = subprocess.run(run_command, shell=True, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-            return {"success": True, "output": result.stdout.decode()}
+            result = subprocess.run(run_command, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
         except subprocess.CalledProcessError as e:
-            return {"success": False, "stage": "execution", "error": e.stderr.decode()}
+            return {"success": False, "stage": "execution", "error": e.stderr.decode('utf-8', errors='replace')}
+        except OSError as e:
+            return {"success": False, "stage": "execution", "error": str(e)}
+
+        output = result.stdout.decode('utf-8', errors='replace')
+        temp_output_file = TestRunner._temp_path(output_file)
+        with open(temp_output_file, 'w') as file:
+            file.write(output)
+        os.replace(temp_output_file, output_file)
+        return {"success": True, "output": output}
 
 class TestAutomationTool:
     def __init__(self, src_dir: str, test_dir: str):
         self.src_dir = src_dir
         self.test_dir = test_dir
 
-    def run(self):
-        cpp_files = [f for f in os.listdir(self.src_dir) if f.endswith('.cpp')]
+    def _process_one(self, cpp_file: os.DirEntry) -> Dict[str, Any]:
+        functions = CppParser.parse_file(cpp_file.path)
+
+        test_file_name = f"test_{cpp_file.name}"
+        test_file_path = os.path.join(self.test_dir, test_file_name)
 
-        for cpp_file in cpp_files:
-            src_file_path = os.path.join(self.src_dir, cpp_file)
-            functions = CppParser.parse_file(src_file_path)
+        TestGenerator.generate_test_file(functions, test_file_path)
+        result = TestRunner.compile_and_run(test_file_path)
+        result["test_file"] = test_file_path
+        return result
+
+    def run(self):
+        with os.scandir(self.src_dir) as entries:
+            cpp_files = [e for e in entries if e.is_file() and e.name.endswith('.cpp')]
+        if not cpp_files:
+            return
 
-            test_file_name = f"test_{cpp_file}"
-            test_file_path = os.path.join(self.test_dir, test_file_name)
+        TestRunner.precompile_header(os.path.join(self.test_dir, _HEADER_FILE))
 
-            TestGenerator.generate_test_file(functions, test_file_path)
-            print(f"Generated test file: {test_file_path}")
+        max_workers = min(len(cpp_files), os.cpu_count() or 1)
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+            results = executor.map(self._process_one, cpp_files)
 
-            result = TestRunner.compile_and_run(test_file_path)
-            if result["success"]:
-                print(f"Test results for {cpp_file}:")
-                print(result["output"])
-            else:
-                print(f"Error in {result['stage']} for {cpp_file}:")
-                print(result["error"])
+            for cpp_file, result in zip((e.name for e in cpp_files), results):
+                print(f"Generated test file: {result['test_file']}")
+                if result["success"]:
+                    print(f"Test results for {cpp_file}:")
+                    print(result["output"])
+                else:
+                    print(f"Error in {result['stage']} for {cpp_file}:")
+                    print(result["error"])
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="C++ Test Automation Tool")
@@ -0,0 +1,59 @@
+import os
+import tempfile
+import unittest
+
+from test_cplus import CppParser
+
+SOURCE = r'''
+#include "functions.h"
+
+// int commented_line(int a) {
+/* void commented_block() {
+} */
+const char* text = "void in_string() {";
+const char brace = '{';
+
+int add(int a, int b) {
+    if (a > b) {
+        return a;
+    }
+    while (b) { b--; }
+    return a + b;
+}
+
+namespace ns {
+int inner(int x) {
+    return x;
+}
+}
+
+extern "C" {
+void c_api() { }
+}
+
+class C {
+public:
+    int method(int a, int b) { return a * b; }
+};
+'''
+
+class CppParserTest(unittest.TestCase):
+    def setUp(self) -> None:
+        fd, self.path = tempfile.mkstemp(suffix='.cpp')
+        with os.fdopen(fd, 'w') as file:
+            file.write(SOURCE)
+
+    def tearDown(self) -> None:
+        os.remove(self.path)
+
+    def test_parse_file(self) -> None:
+        functions = CppParser.parse_file(self.path)
+        self.assertEqual([str(func) for func in functions], [
+            "int add(int a, int b)",
+            "int inner(int x)",
+            "void c_api()",
+            "int method(int a, int b)",
+        ])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,15 +1,32 @@
-import xml.etree.ElementTree as ET
 import json
+import ast
+import re
 import importlib
-import unittest
+import traceback
 import sys
 import time
 import concurrent.futures
 import logging
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Callable, Tuple
+from types import CodeType
 from dataclasses import dataclass
 
-@dataclass
+try:
+    from lxml import etree as ET
+    _HAS_LXML = True
+except ImportError:
+    import xml.etree.ElementTree as ET
+    _HAS_LXML = False
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# orjson turns integers wider than 64 bits into floats; leave any long digit run to json.
+_LONG_NUMBER_RE = re.compile(rb'\d{19,}')
+
+@dataclass(slots=True)
 class TestCase:
     name: str
     module: str
@@ -19,6 +36,53 @@ class TestCase:
     setup: str = None
     teardown: str = None
 
+def _loads(data: bytes) -> Any:
+    if orjson is not None and not _LONG_NUMBER_RE.search(data):
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            pass
+    return json.loads(data)
+
+_FUNC_CACHE: Dict[Tuple[str, str], Callable] = {}
+_CODE_CACHE: Dict[Tuple[str, str], CodeType] = {}
+
+def _compile_snippet(source: str, filename: str) -> CodeType:
+    key = (filename, source)
+    code = _CODE_CACHE.get(key)
+    if code is None:
+        code = _CODE_CACHE[key] = compile(source, filename, 'exec')
+    return code
+
+def _resolve_function(module: str, function: str) -> Callable:
+    key = (module, function)
+    func = _FUNC_CACHE.get(key)
+    if func is None:
+        func = _FUNC_CACHE[key] = getattr(importlib.import_module(module), function)
+    return func
+
+def _parse_literal(text: str) -> Any:
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        return ast.literal_eval(text)
+
+def _iter_xml_test_cases(file_path: str):
+    if _HAS_LXML:
+        for _, element in ET.iterparse(file_path, events=('end',), tag='test_case'):
+            yield element
+            element.clear()
+            while element.getprevious() is not None:
+                del element.getparent()[0]
+    else:
+        context = ET.iterparse(file_path, events=('start', 'end'))
+        _, root = next(context)
+        for event, element in context:
+            if event == 'end' and element.tag == 'test_case':
+                yield element
+                element.clear()
+                root.clear()
+
 class CustomTestLoader:
     def __init__(self, file_path: str):
         self.file_path = file_path
@@ -32,46 +96,34 @@ class CustomTestLoader:
         else:
             raise ValueError("Unsupported file format. Use XML or JSON.")
 
+        for test_case in self.test_cases:
+            if test_case.setup:
+                _compile_snippet(test_case.setup, '<setup>')
+            if test_case.teardown:
+                _compile_snippet(test_case.teardown, '<teardown>')
+
     def _load_xml_tests(self) -> None:
-        tree = ET.parse(self.file_path)
-        root = tree.getroot()
-        for test_case in root.findall('test_case'):
+        for test_case in _iter_xml_test_cases(self.file_path):
+            fields = {child.tag: child.text for child in test_case}
             self.test_cases.append(TestCase(
                 name=test_case.get('name'),
-                module=test_case.find('module').text,
-                function=test_case.find('function').text,
-                inputs=eval(test_case.find('inputs').text),
-                expected_output=eval(test_case.find('expected_output').text),
-                setup=test_case.find('setup').text if test_case.find('setup') is not None else None,
-                teardown=test_case.find('teardown').text if test_case.find('teardown') is not None else None
+                module=fields['module'],
+                function=fields['function'],
+                inputs=_parse_literal(fields['inputs']),
+                expected_output=_parse_literal(fields['expected_output']),
+                setup=fields.get('setup'),
+                teardown=fields.get('teardown')
             ))
 
     def _load_json_tests(self) -> None:
-        with open(self.file_path, 'r') as file:
-            data = json.load(file)
-            for test_case in data:
-                self.test_cases.append(TestCase(**test_case))
-
-class DynamicTest(unittest.TestCase):
-    def __init__(self, test_case: TestCase):
-        super().__init__('run_test')
-        self.test_case = test_case
-
-    def setUp(self) -> None:
-        if self.test_case.setup:
-            exec(self.test_case.setup)
-
-    def tearDown(self) -> None:
-        if self.test_case.teardown:
-            exec(self.test_case.teardown)
-
-    def run_test(self) -> None:
-        module = importlib.import_module(self.test_case.module)
-        function = getattr(module, self.test_case.function)
-        result = function(*self.test_case.inputs)
-        self.assertEqual(result, self.test_case.expected_output)
+        with open(self.file_path, 'rb') as file:
+            data = _loads(file.read())
+        for test_case in data:
+            self.test_cases.append(TestCase(**test_case))
 
 class TestResult:
+    __slots__ = ('test_case', 'success', 'error_message', 'execution_time')
+
     def __init__(self, test_case: TestCase, success: bool, error_message: str = None, execution_time: float = 0):
         self.test_case = test_case
         self.success = success
@@ -79,10 +131,11 @@ class TestResult:
         self.execution_time = execution_time
 
 class TestRunner:
-    def __init__(self, test_cases: List[TestCase], parallel: bool = False, max_workers: int = 4):
+    def __init__(self, test_cases: List[TestCase], parallel: bool = False, max_workers: int = 4, use_processes: bool = True):
         self.test_cases = test_cases
         self.parallel = parallel
         self.max_workers = max_workers
+        self.use_processes = use_processes
         self.results: List[TestResult] = []
 
     def run_tests(self) -> None:
@@ -92,52 +145,69 @@ class TestRunner:
             self._run_sequential()
 
     def _run_sequential(self) -> None:
-        for test_case in self.test_cases:
-            self._run_single_test(test_case)
+        self.results = [self._run_single_test(test_case) for test_case in self.test_cases]
 
     def _run_parallel(self) -> None:
-        with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers) as executor:
-            executor.map(self._run_single_test, self.test_cases)
-
-    def _run_single_test(self, test_case: TestCase) -> None:
-        start_time = time.time()
-        test = DynamicTest(test_case)
-        result = unittest.TestResult()
-        test.run(result)
-        execution_time = time.time() - start_time
-
-        if result.wasSuccessful():
-            self.results.append(TestResult(test_case, True, execution_time=execution_time))
+        if self.use_processes:
+            executor_class = concurrent.futures.ProcessPoolExecutor
         else:
-            error_message = str(result.errors[0][1]) if result.errors else str(result.failures[0][1])
-            self.results.append(TestResult(test_case, False, error_message, execution_time))
+            executor_class = concurrent.futures.ThreadPoolExecutor
+        chunksize = max(1, len(self.test_cases) // (self.max_workers * 4))
+        with executor_class(max_workers=self.max_workers) as executor:
+            self.results = list(executor.map(TestRunner._run_single_test, self.test_cases, chunksize=chunksize))
+
+    @staticmethod
+    def _run_single_test(test_case: TestCase) -> TestResult:
+        # Snippets see this module's globals, as they did when run inside DynamicTest.
+        namespace: Dict[str, Any] = dict(globals())
+        start_time = time.perf_counter()
+        try:
+            if test_case.setup:
+                exec(_compile_snippet(test_case.setup, '<setup>'), namespace)
+            try:
+                output = _resolve_function(test_case.module, test_case.function)(*test_case.inputs)
+            finally:
+                if test_case.teardown:
+                    exec(_compile_snippet(test_case.teardown, '<teardown>'), namespace)
+        except KeyboardInterrupt:
+            raise
+        except BaseException:
+            return TestResult(test_case, False, traceback.format_exc(), time.perf_counter() - start_time)
+        execution_time = time.perf_counter() - start_time
+
+        if output == test_case.expected_output:
+            return TestResult(test_case, True, execution_time=execution_time)
+        error_message = f"expected {test_case.expected_output!r}, got {output!r}"
+        return TestResult(test_case, False, error_message, execution_time)
 
     def generate_report(self) -> Dict[str, Any]:
-        total_tests = len(self.results)
-        passed_tests = sum(1 for result in self.results if result.success)
-        failed_tests = total_tests - passed_tests
-        total_time = sum(result.execution_time for result in self.results)
+        passed_tests = 0
+        total_time = 0.0
+        details = []
+        for result in self.results:
+            passed_tests += result.success
+            total_time += result.execution_time
+            details.append({
+                "name": result.test_case.name,
+                "success": result.success,
+                "execution_time": result.execution_time,
+                "error_message": result.error_message
+            })
 
+        total_tests = len(self.results)
         return {
             "total_tests": total_tests,
             "passed_tests": passed_tests,
-            "failed_tests": failed_tests,
+            "failed_tests": total_tests - passed_tests,
             "total_time": total_time,
-            "details": [
-                {
-                    "name": result.test_case.name,
-                    "success": result.success,
-                    "execution_time": result.execution_time,
-                    "error_message": result.error_message
-                } for result in self.results
-            ]
+            "details": details
         }
 
-def run_tests(file_path: str, parallel: bool = False, max_workers: int = 4) -> None:
+def run_tests(file_path: str, parallel: bool = False, max_workers: int = 4, use_processes: bool = True) -> None:
     loader = CustomTestLoader(file_path)
     loader.load_tests()
 
-    runner = TestRunner(loader.test_cases, parallel, max_workers)
+    runner = TestRunner(loader.test_cases, parallel, max_workers, use_processes)
     runner.run_tests()
 
     report = runner.generate_report()
@@ -152,11 +222,12 @@ if __name__ == "__main__":
     logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
     if len(sys.argv) < 2:
-        print("Usage: python test_tool.py <path_to_test_file> [--parallel] [--max-workers N]")
+        print("Usage: python test_tool.py <path_to_test_file> [--parallel] [--threads] [--max-workers N]")
         sys.exit(1)
 
     test_file = sys.argv[1]
     parallel = "--parallel" in sys.argv
+    use_processes = "--threads" not in sys.argv
     max_workers = 4
 
     if "--max-workers" in sys.argv:
@@ -164,4 +235,4 @@ if __name__ == "__main__":
         if index + 1 < len(sys.argv):
             max_workers = int(sys.argv[index + 1])
 
-    run_tests(test_file, parallel, max_workers)
+    run_tests(test_file, parallel, max_workers, use_processes)
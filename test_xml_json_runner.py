@@ -0,0 +1,52 @@
+import sys
+import unittest
+
+import test_xml_json as tool
+
+MARKER = '<test_xml_json_runner>'
+
+def run(**fields) -> tool.TestResult:
+    return tool.TestRunner._run_single_test(tool.TestCase(name='case', **fields))
+
+class RunSingleTestTest(unittest.TestCase):
+    def test_setup_and_teardown_share_module_globals(self) -> None:
+        result = run(
+            module='operator', function='add', inputs=[1, 2], expected_output=3,
+            setup=f"sys.path.insert(0, {MARKER!r})\ntoken = {MARKER!r}",
+            teardown="sys.path.remove(token)"
+        )
+        self.assertTrue(result.success, result.error_message)
+        self.assertIsNone(result.error_message)
+        self.assertNotIn(MARKER, sys.path)
+
+    def test_wrong_output(self) -> None:
+        result = run(module='operator', function='add', inputs=[1, 1], expected_output=3)
+        self.assertFalse(result.success)
+        self.assertEqual(result.error_message, "expected 3, got 2")
+
+    def test_exception(self) -> None:
+        result = run(module='operator', function='truediv', inputs=[1, 0], expected_output=None)
+        self.assertFalse(result.success)
+        self.assertIn("ZeroDivisionError", result.error_message)
+
+    def test_system_exit(self) -> None:
+        result = run(module='sys', function='exit', inputs=[3], expected_output=None)
+        self.assertFalse(result.success)
+        self.assertIn("SystemExit: 3", result.error_message)
+
+    def test_teardown_error(self) -> None:
+        result = run(module='operator', function='add', inputs=[1, 2], expected_output=3,
+                     teardown="raise RuntimeError('teardown failed')")
+        self.assertFalse(result.success)
+        self.assertIn("teardown failed", result.error_message)
+
+    def test_setup_error_skips_teardown(self) -> None:
+        result = run(module='operator', function='add', inputs=[1, 2], expected_output=3,
+                     setup="raise RuntimeError('setup failed')",
+                     teardown=f"sys.path.append({MARKER!r})")
+        self.assertFalse(result.success)
+        self.assertIn("setup failed", result.error_message)
+        self.assertNotIn(MARKER, sys.path)
+
+if __name__ == "__main__":
+    unittest.main()